@@ -0,0 +1,187 @@
+"""
+GELF over UDP
+
+Minimal non-blocking GELF sender for the analyzer. It replaces graypy's
+GELFUDPHandler so analyzed messages skip the logging machinery and are written
+through an asyncio DatagramTransport instead of a blocking socket.
+
+- envelope_prefix(): the static part of every record (version, host, level and
+                   the caller's static fields), serialized once per sender.
+- encode():        one GELF 1.1 payload spliced from that prefix, the timestamp
+                   and the JSON-escaped short_message; zlib-compressed only at
+                   COMPRESS_MIN_BYTES and above, since GELF accepts plain JSON
+                   and tiny payloads barely shrink.
+- chunk():         splits payloads above CHUNK_SIZE into GELF chunks.
+- GelfUdpSender:   owns the transport to Graylog; send()/send_many() never block.
+                   send_many() flushes a whole packet's datagrams with one
+                   sendmmsg(2) call on Linux, falling back to one sendto each.
+
+"""
+
+import asyncio
+import ctypes
+import logging
+import os
+import socket
+import struct
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8154  # 8192 minus the 12-byte chunk header, with headroom
+CHUNK_MAGIC = b"\x1e\x0f"
+MAX_CHUNKS = 128
+COMPRESS_MIN_BYTES = 512
+SENDMMSG_MAX = 1024  # UIO_MAXIOV
+HOSTNAME = socket.gethostname()
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_SENDMMSG = _load_sendmmsg()
+
+
+def sendmmsg(fd: int, datagrams: List[bytes]) -> int:
+    """Send datagrams on a connected socket in one syscall; returns how many went out."""
+    count = len(datagrams)
+    iovecs = (_IOVec * count)()
+    msgs = (_MMsgHdr * count)()
+    for i, datagram in enumerate(datagrams):
+        iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(datagram), ctypes.c_void_p)
+        iovecs[i].iov_len = len(datagram)
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+    sent = _SENDMMSG(fd, msgs, count, 0)
+    return max(sent, 0)  # -1 (e.g. EAGAIN): caller falls back for the rest
+
+
+def envelope_prefix(static_fields: Dict[str, object]) -> bytes:
+    """Serialized record minus its closing brace, ready for the per-message fields."""
+    record = {"version": "1.1", "host": HOSTNAME, "level": 6}  # syslog INFO
+    record.update(static_fields)
+    return orjson.dumps(record)[:-1] + b',"timestamp":'
+
+
+def encode(prefix: bytes, timestamp: bytes, short_message: str) -> bytes:
+    payload = b"".join(
+        (prefix, timestamp, b',"short_message":', orjson.dumps(short_message), b"}")
+    )
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        return zlib.compress(payload)
+    return payload
+
+
+def chunk(payload: bytes) -> Iterator[bytes]:
+    if len(payload) <= CHUNK_SIZE:
+        yield payload
+        return
+    total = -(-len(payload) // CHUNK_SIZE)
+    if total > MAX_CHUNKS:
+        logger.warning("Dropping GELF payload of %d bytes: too large", len(payload))
+        return
+    message_id = os.urandom(8)
+    for seq in range(total):
+        part = payload[seq * CHUNK_SIZE : (seq + 1) * CHUNK_SIZE]
+        yield CHUNK_MAGIC + message_id + struct.pack("BB", seq, total) + part
+
+
+class GelfUdpSender:
+    def __init__(
+        self, transport: asyncio.DatagramTransport, static_fields: Dict[str, object]
+    ) -> None:
+        self.transport = transport
+        self.prefix = envelope_prefix(static_fields)
+
+    @classmethod
+    async def connect(
+        cls,
+        host: str,
+        port: int,
+        static_fields: Dict[str, object],
+        sndbuf: int = 0,
+        retries: int = 30,
+    ) -> "GelfUdpSender":
+        """Resolve Graylog once (retrying while DNS catches up) and open the transport."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(retries):
+            try:
+                infos = await loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+                break
+            except socket.gaierror as error:
+                if attempt == retries - 1:
+                    raise
+                logger.warning("Cannot resolve %s yet: %s", host, error)
+                await asyncio.sleep(1)
+        family, _, _, _, address = infos[0]
+        transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=address, family=family
+        )
+        if sndbuf:
+            sock = transport.get_extra_info("socket")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        return cls(transport, static_fields)
+
+    def send(self, short_message: str) -> None:
+        timestamp = orjson.dumps(time.time())
+        for datagram in chunk(encode(self.prefix, timestamp, short_message)):
+            self.transport.sendto(datagram)
+
+    def send_many(self, short_messages: Iterable[str]) -> None:
+        # one timestamp per call: a packet's messages are analyzed together
+        timestamp = orjson.dumps(time.time())
+        datagrams = [
+            datagram
+            for short_message in short_messages
+            for datagram in chunk(encode(self.prefix, timestamp, short_message))
+        ]
+        sock = self.transport.get_extra_info("socket")
+        sent = 0
+        if _SENDMMSG is not None and sock is not None:
+            fd = sock.fileno()
+            while sent < len(datagrams):
+                n = sendmmsg(fd, datagrams[sent : sent + SENDMMSG_MAX])
+                if n == 0:
+                    break
+                sent += n
+        # leftovers (no sendmmsg, or kernel buffer full) go through the transport
+        for datagram in datagrams[sent:]:
+            self.transport.sendto(datagram)
+
+    def close(self) -> None:
+        self.transport.close()
@@ -2,61 +2,128 @@
 Analyzer gRPC Service
 
 This module implements a lightweight analyzer process that:
-  • Exposes a gRPC service (Analyzer.Analyze) for receiving batches of log messages.
-  • Streams each message to Graylog via GELF UDP.
-  • Polls MongoDB for an "active" flag that can enable/disable request handling at runtime.
+  • Exposes a gRPC service (Analyzer.Analyze / Analyzer.AnalyzeBatch) for receiving
+    batches of log messages, either one packet per call or streamed.
+  • Streams each message to Graylog via GELF UDP (non-blocking, see gelf.py).
+  • Serves gRPC with grpc.aio, so handlers and GELF sends share one event loop
+    instead of hopping between pool threads.
+  • Watches MongoDB from the same event loop (motor change stream, or polling as a
+    fallback) for an "active" flag that can enable/disable request handling at runtime.
+  • Runs ANALYZER_PROCESSES server processes bound to the same port via SO_REUSEPORT,
+    so the kernel spreads connections across independent GILs.
 
 """
 
-import os, time, threading, logging
+import os, sys, logging, asyncio
+import multiprocessing
+from multiprocessing.connection import wait
 from concurrent import futures
 from datetime import datetime
 
 import grpc
-from pymongo import MongoClient
+from google.protobuf.internal import api_implementation
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import PyMongoError
-from graypy import GELFUDPHandler
 
 import logs_pb2
 import logs_pb2_grpc
+from gelf import GelfUdpSender
 
 ANALYZER_NAME = os.environ.get("ANALYZER_NAME", "analyzer1")
 MONGO_URI = os.environ.get("MONGO_URI", "mongodb://mongo:27017/")
 GRAYLOG_HOST = os.environ.get("GRAYLOG_HOST", "graylog")
 GRAYLOG_PORT = int(os.environ.get("GRAYLOG_PORT", "12201"))
 POLL_SECS = 2
+# SO_REUSEPORT balances per connection, so processes beyond the number of client
+# connections (the distributor's GRPC_CHANNELS_PER_ANALYZER) never get an RPC.
+# os.cpu_count() is the host's core count inside a container, so don't use it.
+ANALYZER_PROCESSES = int(os.environ.get("ANALYZER_PROCESSES", "1"))
+GELF_SNDBUF_BYTES = 4 << 20
+
+SERVER_OPTIONS = [
+    ("grpc.so_reuseport", 1),
+    ("grpc.max_receive_message_length", 32 << 20),
+    ("grpc.optimization_target", "throughput"),
+    # accept the distributor's 10s keepalive pings instead of answering GOAWAY
+    ("grpc.http2.min_ping_interval_without_data_ms", 5000),
+    ("grpc.http2.max_ping_strikes", 0),
+]
+MAX_CONCURRENT_RPCS = int(os.environ.get("MAX_CONCURRENT_RPCS", "512"))
+
+# grpc.aio's migration_thread_pool only runs synchronous handlers. Every handler
+# here is a coroutine, so the pool is an idle fallback today, kept (and sized via
+# ANALYZER_WORKERS) in case a synchronous handler is added later.
+ANALYZER_WORKERS = int(
+    os.environ.get("ANALYZER_WORKERS", min(32, (os.cpu_count() or 1) * 2))
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-logger.addHandler(GELFUDPHandler(GRAYLOG_HOST, GRAYLOG_PORT))
 
-MONGO_CLIENT = MongoClient(MONGO_URI)
+MONGO_CLIENT = AsyncIOMotorClient(MONGO_URI)
 ANALYZERS_COL = MONGO_CLIENT.control.analyzers
 
 active = True  # analyzer is by default "ON", unless it is explicitly turned "OFF" by Mongo state below via Web UI.
 
 
-def poll_active():
+ACTIVE_CHANGE_PIPELINE = [
+    {
+        "$match": {
+            "fullDocument.name": ANALYZER_NAME,
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }
+    }
+]
+
+
+async def watch_active():
     global active  # TODO: avoid using global variable
+    stream_warned = False
     while True:
         try:
-            doc = ANALYZERS_COL.find_one({"name": ANALYZER_NAME}) or {}
+            doc = await ANALYZERS_COL.find_one({"name": ANALYZER_NAME}) or {}
             active = bool(doc.get("active", True))
         except PyMongoError as e:
             logger.warning("Mongo check failed: %s", e)
-        time.sleep(POLL_SECS)
+            await asyncio.sleep(POLL_SECS)
+            continue
+
+        # Wait on pushed updates in the server's own event loop instead of a
+        # polling thread. Change streams need a replica set; on a standalone
+        # Mongo this falls back to re-reading every POLL_SECS.
+        try:
+            async with ANALYZERS_COL.watch(
+                ACTIVE_CHANGE_PIPELINE, full_document="updateLookup"
+            ) as stream:
+                async for change in stream:
+                    # updateLookup yields None if the doc was deleted meanwhile
+                    document = change.get("fullDocument") or {}
+                    active = bool(document.get("active", True))
+        except PyMongoError as e:
+            if not stream_warned:
+                logger.warning("Mongo change stream unavailable, polling: %s", e)
+                stream_warned = True
+        await asyncio.sleep(POLL_SECS)
 
 
 class AnalyzerService(logs_pb2_grpc.AnalyzerServicer):
-    def Analyze(self, request, context):
+    def __init__(self, gelf: GelfUdpSender) -> None:
+        self.gelf = gelf
+
+    async def analyze_packet(self, request, context):
         if not active:
-            context.abort(grpc.StatusCode.UNAVAILABLE, f"{ANALYZER_NAME} inactive")
+            await context.abort(
+                grpc.StatusCode.UNAVAILABLE, f"{ANALYZER_NAME} inactive"
+            )
 
         # Trivial processing: just log each message with extra str to Graylog
         # This part is the bottleneck for the entire system.
-        for msg in request.messages:
-            logger.info(f"{ANALYZER_NAME}: {msg.message} - I was analyzed!")
+        # All of a packet's messages leave in one sendmmsg() call.
+        self.gelf.send_many(
+            f"{ANALYZER_NAME}: {msg.message} - I was analyzed!"
+            for msg in request.messages
+        )
 
         # Note: web app will search by ANALYZER_NAME prefix.
         # Punting on a more resilent way of storing / searching logs for now
@@ -65,15 +132,82 @@ class AnalyzerService(logs_pb2_grpc.AnalyzerServicer):
             accepted=True, note=f"{ANALYZER_NAME} accepted {len(request.messages)} msgs"
         )
 
+    async def Analyze(self, request, context):
+        return await self.analyze_packet(request, context)
+
+    async def AnalyzeBatch(self, request_iterator, context):
+        # One ack per packet, in order; the distributor batches many
+        # /ingest calls into a single stream to amortize per-RPC overhead.
+        async for request in request_iterator:
+            yield await self.analyze_packet(request, context)
+
+
+def require_native_protobuf():
+    # same guard as the distributor: never serve on the pure-Python protobuf backend
+    backend = api_implementation.Type()
+    if backend not in ("cpp", "upb"):
+        raise RuntimeError(
+            f"protobuf is using the {backend!r} backend; install protobuf>=4.21 "
+            "for the native (upb) runtime"
+        )
+
 
-def serve():
-    threading.Thread(target=poll_active, daemon=True).start()
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
-    logs_pb2_grpc.add_AnalyzerServicer_to_server(AnalyzerService(), server)
+async def serve():
+    require_native_protobuf()
+    # first thing the task does is read the current flag, then it watches
+    watcher = asyncio.create_task(watch_active())
+    gelf = await GelfUdpSender.connect(
+        GRAYLOG_HOST,
+        GRAYLOG_PORT,
+        static_fields={"_analyzer": ANALYZER_NAME},
+        sndbuf=GELF_SNDBUF_BYTES,
+    )
+    server = grpc.aio.server(
+        migration_thread_pool=futures.ThreadPoolExecutor(
+            max_workers=ANALYZER_WORKERS, thread_name_prefix="analyze"
+        ),
+        options=SERVER_OPTIONS,
+        maximum_concurrent_rpcs=MAX_CONCURRENT_RPCS,
+    )
+    logs_pb2_grpc.add_AnalyzerServicer_to_server(AnalyzerService(gelf), server)
     server.add_insecure_port("[::]:50051")
-    server.start()
-    server.wait_for_termination()
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        watcher.cancel()
+        gelf.close()
+
+
+def run():
+    asyncio.run(serve())
+
+
+def serve_all():
+    if ANALYZER_PROCESSES <= 1:
+        run()
+        return
+    # spawn (not fork) so each child builds its own Mongo client and gRPC runtime
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=run, daemon=True) for _ in range(ANALYZER_PROCESSES)]
+    logger.info("Starting %d analyzer processes on :50051", ANALYZER_PROCESSES)
+    for p in procs:
+        p.start()
+    # A child that dies (e.g. GELF connect gave up) would silently cut capacity;
+    # exit instead so the container is restarted with a full set of processes.
+    exited = wait([p.sentinel for p in procs])
+    exitcode = 1
+    for p in procs:
+        if p.sentinel in exited:
+            p.join()
+            exitcode = p.exitcode if p.exitcode and p.exitcode > 0 else 1
+            logger.error("Analyzer process %d exited with %s", p.pid, p.exitcode)
+    for p in procs:
+        if p.is_alive():
+            p.terminate()
+            p.join()
+    sys.exit(exitcode)
 
 
 if __name__ == "__main__":
-    serve()
+    serve_all()
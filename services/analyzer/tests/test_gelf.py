@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import socket
+import zlib
+
+import pytest
+
+import gelf
+from gelf import (
+    CHUNK_MAGIC,
+    CHUNK_SIZE,
+    COMPRESS_MIN_BYTES,
+    MAX_CHUNKS,
+    GelfUdpSender,
+    chunk,
+    encode,
+    envelope_prefix,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def decode(payload):
+    if payload[:1] == b"{":
+        return json.loads(payload)
+    return json.loads(zlib.decompress(payload))
+
+
+def reassemble(datagrams):
+    """Group GELF datagrams into whole payloads, joining chunked ones."""
+    payloads, parts = [], {}
+    for datagram in datagrams:
+        if not datagram.startswith(CHUNK_MAGIC):
+            payloads.append(datagram)
+            continue
+        message_id, seq, total = datagram[2:10], datagram[10], datagram[11]
+        parts.setdefault(message_id, {})[seq] = datagram[12:]
+        if len(parts[message_id]) == total:
+            chunks = parts.pop(message_id)
+            payloads.append(b"".join(chunks[i] for i in range(total)))
+    assert not parts, "incomplete chunked payload"
+    return payloads
+
+
+def send_and_receive(short_messages):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+
+    async def scenario():
+        sender = await GelfUdpSender.connect(
+            "127.0.0.1", receiver.getsockname()[1], {"_analyzer": "a1"}
+        )
+        sender.send_many(short_messages)
+        sender.close()
+
+    try:
+        run(scenario())
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(receiver.recv(65535))
+            except socket.timeout:
+                break
+            receiver.settimeout(0.2)
+        return datagrams
+    finally:
+        receiver.close()
+
+
+@pytest.fixture(params=["sendmmsg", "sendto"])
+def send_path(request, monkeypatch):
+    if request.param == "sendto":
+        monkeypatch.setattr(gelf, "_SENDMMSG", None)
+    elif gelf._SENDMMSG is None:
+        pytest.skip("sendmmsg is Linux-only")
+    return request.param
+
+
+def test_send_many_delivers_each_message(send_path):
+    messages = ["first", "second", "third"]
+    datagrams = send_and_receive(messages)
+    assert [decode(d)["short_message"] for d in datagrams] == messages
+
+
+def test_send_many_chunks_large_payloads(send_path):
+    # hex text only compresses ~2x, so this still needs several chunks
+    big = os.urandom(20000).hex()
+    datagrams = send_and_receive(["small", big])
+    chunked = [d for d in datagrams if d.startswith(CHUNK_MAGIC)]
+    assert len(chunked) > 1
+    assert {d[11] for d in chunked} == {len(chunked)}
+    assert all(len(d) <= CHUNK_SIZE + 12 for d in datagrams)
+    records = [decode(p) for p in reassemble(datagrams)]
+    assert sorted(r["short_message"] for r in records) == sorted(["small", big])
+
+
+def test_chunk_headers():
+    payload = os.urandom(CHUNK_SIZE * 2 + 100)
+    parts = list(chunk(payload))
+    assert len(parts) == 3
+    assert all(p.startswith(CHUNK_MAGIC) for p in parts)
+    assert len({p[2:10] for p in parts}) == 1  # one message id
+    assert [(p[10], p[11]) for p in parts] == [(0, 3), (1, 3), (2, 3)]
+    assert b"".join(p[12:] for p in parts) == payload
+
+
+def test_chunk_passes_small_payloads_through():
+    payload = b"x" * CHUNK_SIZE
+    assert list(chunk(payload)) == [payload]
+
+
+def test_chunk_drops_payloads_over_max_chunks():
+    assert list(chunk(b"x" * (CHUNK_SIZE * MAX_CHUNKS + 1))) == []
+
+
+def test_encode_compresses_only_large_payloads():
+    prefix = envelope_prefix({})
+    small = encode(prefix, b"1.5", "short")
+    assert len(small) < COMPRESS_MIN_BYTES
+    assert json.loads(small)["short_message"] == "short"
+
+    large = encode(prefix, b"1.5", "y" * COMPRESS_MIN_BYTES)
+    assert not large.startswith(b"{")
+    assert (
+        json.loads(zlib.decompress(large))["short_message"] == "y" * COMPRESS_MIN_BYTES
+    )
+
+
+def test_encode_escapes_short_message():
+    message = 'quote " backslash \\ newline \n tab \t unicode é ✓ nul \x00'
+    record = json.loads(encode(envelope_prefix({}), b"1.5", message))
+    assert record["short_message"] == message
+
+
+def test_envelope_splice_parses_to_full_record():
+    prefix = envelope_prefix({"_analyzer": "analyzer1", "_source": 'say "hi"'})
+    record = json.loads(encode(prefix, b"1700000000.25", "hello"))
+    assert record == {
+        "version": "1.1",
+        "host": gelf.HOSTNAME,
+        "level": 6,
+        "_analyzer": "analyzer1",
+        "_source": 'say "hi"',
+        "timestamp": 1700000000.25,
+        "short_message": "hello",
+    }
+
+
+def test_sender_uses_its_static_fields(send_path):
+    datagrams = send_and_receive(["hello"])
+    record = decode(datagrams[0])
+    assert record["_analyzer"] == "a1"
+    assert record["host"] == gelf.HOSTNAME
+    assert isinstance(record["timestamp"], float)
@@ -0,0 +1,84 @@
+"""
+AliasTable
+
+O(1) weighted random selection using Vose's alias method. The table is built
+once per weight change (O(N)) and each pick costs two random draws, instead of
+rebuilding a weights list and calling random.choices() on every request.
+
+Weights
+-------
+- Negative weights are treated as 0.
+- If every weight is 0, selection falls back to an even distribution.
+
+Exclusion
+---------
+pick_index_excluding() skips indices whose bit is set in an int mask (e.g.
+analyzers already tried for this request) by redrawing, which keeps the picks
+proportional to the remaining weights without building a new table.
+
+"""
+
+from __future__ import annotations
+import random
+from typing import List, Sequence, Tuple
+
+
+def build_alias_table(weights: Sequence[float]) -> Tuple[List[float], List[int]]:
+    """Return (prob, alias) lists for Vose's alias method."""
+    n = len(weights)
+    if n == 0:
+        return [], []
+    clamped = [max(0.0, float(w)) for w in weights]
+    total = sum(clamped)
+    if total <= 0:
+        clamped = [1.0] * n
+        total = float(n)
+
+    scaled = [w * n / total for w in clamped]
+    prob = [0.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+
+    # leftovers are 1.0 up to float rounding
+    for i in large + small:
+        prob[i] = 1.0
+    return prob, alias
+
+
+class AliasTable:
+    def __init__(self, names: Sequence[str], weights: Sequence[float]) -> None:
+        if len(names) != len(weights):
+            raise ValueError("names and weights must be the same length")
+        self.names = tuple(names)
+        self.weights = tuple(max(0.0, float(w)) for w in weights)
+        self.prob, self.alias = build_alias_table(self.weights)
+
+    def pick_index(self) -> int:
+        i = int(random.random() * len(self.names))
+        return i if random.random() < self.prob[i] else self.alias[i]
+
+    def pick_index_excluding(self, mask: int, max_draws: int = 8) -> int:
+        """pick_index() over the indices whose bit is not set in mask."""
+        for _ in range(max_draws):
+            i = self.pick_index()
+            if not (mask >> i) & 1:
+                return i
+        # most of the weight is excluded: choose directly among what's left
+        remaining = [i for i in range(len(self.names)) if not (mask >> i) & 1]
+        if not remaining:
+            raise ValueError("every index is excluded")
+        weights = [self.weights[i] for i in remaining]
+        if sum(weights) <= 0:
+            return random.choice(remaining)
+        return random.choices(remaining, weights=weights, k=1)[0]
+
+    def pick(self) -> str:
+        return self.names[self.pick_index()]
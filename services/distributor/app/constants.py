@@ -1,6 +1,6 @@
 import os
 from typing import Dict, Optional
-import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
 
 
 def parse_weights(env: Optional[str]) -> Dict[str, float]:
@@ -21,7 +21,7 @@ def parse_weights(env: Optional[str]) -> Dict[str, float]:
 
 
 MONGO_URI = os.environ.get("MONGO_URI", "mongodb://mongo:27017/")
-MONGO_CLIENT = pymongo.MongoClient(MONGO_URI)
+MONGO_CLIENT = AsyncIOMotorClient(MONGO_URI)
 CONTROL_DB = MONGO_CLIENT.control
 WEIGHTS_COL = CONTROL_DB.weights
 
@@ -31,10 +31,34 @@ ANALYZERS_ENV: str = os.environ.get("ANALYZERS", "")
 # Only allow this long to send to analyzer
 ANALYZER_TIMEOUT_MS: int = int(os.environ.get("ANALYZER_TIMEOUT_MS", "200"))
 
+# Coalesce packets per analyzer for this long (ms) into one AnalyzeBatch stream
+BATCH_WINDOW_MS: float = float(os.environ.get("BATCH_WINDOW_MS", "1"))
+
+# Upper bound on packets sent in a single AnalyzeBatch stream
+BATCH_MAX_PACKETS: int = int(os.environ.get("BATCH_MAX_PACKETS", "64"))
+
+# Independent HTTP/2 connections opened to each analyzer; streams are
+# round-robined across them so one connection's flow-control window or
+# max-concurrent-streams limit doesn't cap throughput
+GRPC_CHANNELS_PER_ANALYZER: int = int(os.environ.get("GRPC_CHANNELS_PER_ANALYZER", "4"))
+
+# Options applied to every analyzer gRPC channel. The local subchannel pool stops
+# gRPC from collapsing identical channels back onto one shared connection.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.optimization_target", "throughput"),
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.http2.min_time_between_pings_ms", 10000),
+    ("grpc.http2.bdp_probe", 1),
+]
+
 # Default weights come in like: analyzer1:0.4,analyzer2:0.3,...
 DEFAULT_WEIGHTS_ENV: str = os.environ.get("DEFAULT_WEIGHTS", "")
 
-# Poll Mongo for weight updates on this frequency (seconds)
+# Poll Mongo for weight updates on this frequency (seconds) when change streams
+# are unavailable (e.g. Mongo is not running as a replica set)
 WEIGHT_POLL_SECS: int = int(os.environ.get("WEIGHT_POLL_SECS", "5"))
 
 # Circuit breaker tuning
@@ -53,6 +77,10 @@ __all__ = [
     "MONGO_URI",
     "ANALYZERS_ENV",
     "ANALYZER_TIMEOUT_MS",
+    "BATCH_WINDOW_MS",
+    "BATCH_MAX_PACKETS",
+    "GRPC_CHANNELS_PER_ANALYZER",
+    "GRPC_CHANNEL_OPTIONS",
     "DEFAULT_WEIGHTS_ENV",
     "WEIGHT_POLL_SECS",
     "CB_FAILURE_THRESHOLD",
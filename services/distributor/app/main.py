@@ -8,31 +8,44 @@ from MongoDB so you can steer traffic without restarting the service.
 
 Key capabilities
 ----------------
-- Weighted routing: random.choices() using a weight per analyzer.
+- Weighted routing: O(1) alias-table pick, rebuilt only when weights change.
 - Resilience: per-analyzer SimpleCircuitBreaker (closed/open/half_open).
+- Batching: per-analyzer PacketBatcher coalesces packets into AnalyzeBatch streams.
 - Async I/O: FastAPI + grpc.aio for high throughput.
-- Live config: background task watches MongoDB for weight changes.
+- Live config: background task follows a MongoDB change stream for weight changes
+  (falling back to polling when change streams are unavailable).
 - Introspection: /health endpoint reports analyzers, weights, and breaker states.
 
 """
 
-import os, asyncio, random
+import os, asyncio, collections, itertools
 import logging, sys
+import orjson
+import msgpack
 from typing import List, Dict, Tuple
-from fastapi import FastAPI, HTTPException, Response
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 import grpc
 from grpc.aio import AioRpcError
-import pymongo
+from google.protobuf.message import DecodeError
+from google.protobuf.internal import api_implementation
+from pymongo.errors import PyMongoError
 from types import SimpleNamespace
 from prometheus_client import Counter, CONTENT_TYPE_LATEST, generate_latest
 
 from . import logs_pb2, logs_pb2_grpc
 from .simple_circuit_breaker import SimpleCircuitBreaker
+from .packet_batcher import PacketBatcher, IncompleteBatchError, collect_acks
+from .alias_table import AliasTable
 from .constants import (
     MONGO_URI,
     ANALYZERS_ENV,
     ANALYZER_TIMEOUT_MS,
+    BATCH_WINDOW_MS,
+    BATCH_MAX_PACKETS,
+    GRPC_CHANNELS_PER_ANALYZER,
+    GRPC_CHANNEL_OPTIONS,
     DEFAULT_WEIGHTS_ENV,
     WEIGHT_POLL_SECS,
     CB_FAILURE_THRESHOLD,
@@ -48,6 +61,11 @@ SUCCESS = Counter(
 )
 FAILURE = Counter("distributor_analyzer_failure_total", "Total failed analyzer calls")
 
+# /ingest bumps these in-process; flush_metrics() applies them to Prometheus so
+# the counters' locks stay off the request path.
+PENDING_METRICS: collections.Counter = collections.Counter()
+METRICS_FLUSH_SECS = 0.1
+
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -55,48 +73,147 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
-app = FastAPI()
+
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered by orjson, which emits bytes directly."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(default_response_class=OrjsonResponse)
 
 app.state.ctx = SimpleNamespace(
-    channels={},  # Dict[str, grpc.aio.Channel]
-    stubs={},  # Dict[str, logs_pb2_grpc.AnalyzerStub]
+    channels={},  # Dict[str, List[grpc.aio.Channel]]
+    stubs={},  # Dict[str, Iterator[logs_pb2_grpc.AnalyzerStub]], round-robin
     weight_map={},  # Dict[str, float]
     analyzer_hosts={},  # Dict[str, Tuple[str, int]]
     circuit_breakers={},  # Dict[str, SimpleCircuitBreaker]
+    batchers={},  # Dict[str, PacketBatcher]
+    alias_table=AliasTable((), ()),  # rebuilt whenever weight_map changes
 )
 
 
-class LogMessage(BaseModel):
-    timestamp: str
-    level: str = "INFO"
-    message: str
-    attrs: Dict[str, str] = Field(default_factory=dict)
+class IngestAck(BaseModel):
+    """Documents the /ingest response shape; handlers return plain dicts."""
+
+    accepted_by: str
+    count: int
+
 
+WEIGHTS_CHANGE_PIPELINE = [
+    {
+        "$match": {
+            "documentKey._id": "weights",
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }
+    }
+]
+
+
+def apply_weights(current_weights_mapping: Dict[str, float]) -> None:
+    """Merge a weights mapping into weight_map, rebuilding the pick table on change."""
+    ctx = app.state.ctx
+    logger.debug("Current weights mapping: %s", current_weights_mapping)
+    previous_weights = dict(ctx.weight_map)
+    ctx.weight_map.update(current_weights_mapping)
+    if ctx.weight_map != previous_weights:
+        rebuild_alias_table()
 
-class LogPacket(BaseModel):
-    source_id: str = "sim"
-    messages: List[LogMessage]
+
+async def load_weights() -> None:
+    """Read the weights document once and apply it."""
+    mongo_result = await WEIGHTS_COL.find_one({"_id": "weights"})
+    if mongo_result is not None:
+        apply_weights(mongo_result.get("values", {}))
+    else:
+        logger.warning("No weights found in MongoDB, using default weights.")
+        apply_weights(DEFAULT_ANALYZER_TO_WEIGHTS)
 
 
 async def poll_weights_updates() -> None:
     """Keep weight_map up to date async based on whats set in Web UI."""
-    ctx = app.state.ctx
+    warned = False
     while True:
-        mongo_result = WEIGHTS_COL.find_one({"_id": "weights"})
-        if mongo_result is not None:
-            current_weights_mapping = mongo_result.get("values", {})
-        else:
-            logger.warning("No weights found in MongoDB, using default weights.")
-            current_weights_mapping = DEFAULT_ANALYZER_TO_WEIGHTS
+        try:
+            await load_weights()
+        except PyMongoError as error:
+            logger.warning("Mongo weights read failed: %s", error)
+            await asyncio.sleep(WEIGHT_POLL_SECS)
+            continue
 
-        logger.debug(f"Current weights mapping: {current_weights_mapping}")
-        ctx.weight_map.update(current_weights_mapping)
+        try:
+            # Mongo pushes weight edits to us; no polling while the stream is open.
+            async with WEIGHTS_COL.watch(
+                WEIGHTS_CHANGE_PIPELINE, full_document="updateLookup"
+            ) as stream:
+                async for change in stream:
+                    apply_weights((change.get("fullDocument") or {}).get("values", {}))
+        except PyMongoError as error:
+            if not warned:
+                logger.warning(
+                    "Weights change stream unavailable (%s), polling every %ss.",
+                    error,
+                    WEIGHT_POLL_SECS,
+                )
+                warned = True
         await asyncio.sleep(WEIGHT_POLL_SECS)
 
 
+def rebuild_alias_table() -> None:
+    """Precompute the weighted pick over all analyzers from weight_map."""
+    ctx = app.state.ctx
+    names = tuple(ctx.analyzer_hosts.keys())
+    weights = [ctx.weight_map.get(name, 0.0) for name in names]
+    if sum(max(0.0, w) for w in weights) <= 0:
+        logger.warning(
+            "Sum of all weights cant be less than zero. Using even distribution."
+        )
+    ctx.alias_table = AliasTable(names, weights)
+
+
+async def flush_metrics() -> None:
+    """Apply buffered counter increments to the Prometheus counters."""
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECS)
+        if PENDING_METRICS:
+            pending = PENDING_METRICS.copy()
+            PENDING_METRICS.clear()
+            for metric, amount in pending.items():
+                metric.inc(amount)
+
+
+def make_batch_sender(name: str):
+    """Build the send_batch callable that streams packets to one analyzer."""
+    ctx = app.state.ctx
+
+    async def send_batch(packets: List[logs_pb2.LogPacket]) -> List[logs_pb2.Ack]:
+        call = next(ctx.stubs[name]).AnalyzeBatch(
+            iter(packets), timeout=ANALYZER_TIMEOUT_MS / 1000.0
+        )
+        # a stream cut short (deadline, analyzer toggled off) still acks its
+        # first packets; only the rest fail over to another analyzer
+        return await collect_acks(call, (AioRpcError,))
+
+    return send_batch
+
+
+def require_native_protobuf() -> None:
+    # The pure-Python backend is ~20x slower at parsing LogPackets; refuse to
+    # start on it so a broken image is caught at deploy time, not under load.
+    backend = api_implementation.Type()
+    if backend not in ("cpp", "upb"):
+        raise RuntimeError(
+            f"protobuf is using the {backend!r} backend; install protobuf>=4.21 "
+            "for the native (upb) runtime"
+        )
+
+
 @app.on_event("startup")
 async def startup() -> None:
     ctx = app.state.ctx
+    require_native_protobuf()
 
     # init analyzer_hosts from ANALYZERS_ENV
     for entry in ANALYZERS_ENV.split(","):
@@ -107,6 +224,7 @@ async def startup() -> None:
 
     # default weights
     ctx.weight_map.update(DEFAULT_ANALYZER_TO_WEIGHTS)
+    rebuild_alias_table()
 
     # circuit breakers per analyzer
     for name in ctx.analyzer_hosts.keys():
@@ -117,14 +235,30 @@ async def startup() -> None:
             half_open_success_threshold=CB_HALF_OPEN_SUCC_THRESHOLD,
         )
 
-    # gRPC channels + stubs
+    # gRPC channels + stubs, several connections per analyzer
     for name, (host, port) in ctx.analyzer_hosts.items():
-        ch = grpc.aio.insecure_channel(f"{host}:{port}")
-        ctx.channels[name] = ch
-        ctx.stubs[name] = logs_pb2_grpc.AnalyzerStub(ch)
+        channels = [
+            grpc.aio.insecure_channel(f"{host}:{port}", options=GRPC_CHANNEL_OPTIONS)
+            for _ in range(GRPC_CHANNELS_PER_ANALYZER)
+        ]
+        ctx.channels[name] = channels
+        ctx.stubs[name] = itertools.cycle(
+            [logs_pb2_grpc.AnalyzerStub(ch) for ch in channels]
+        )
+
+    # batchers coalesce concurrent ingests into one stream per analyzer
+    for name in ctx.analyzer_hosts.keys():
+        ctx.batchers[name] = PacketBatcher(
+            name,
+            make_batch_sender(name),
+            window_secs=BATCH_WINDOW_MS / 1000.0,
+            max_batch=BATCH_MAX_PACKETS,
+        )
+        ctx.batchers[name].start()
 
-    # start weights poller
+    # start weights poller and metrics flusher
     asyncio.create_task(poll_weights_updates())
+    asyncio.create_task(flush_metrics())
 
     logger.info(
         "Distributor started. analyzers=%s weights=%s",
@@ -133,20 +267,6 @@ async def startup() -> None:
     )
 
 
-def weighted_analyzer_choice(candidates: List[str]) -> str:
-    ctx = app.state.ctx
-    current_weights = [ctx.weight_map.get(candidate, 0.0) for candidate in candidates]
-    sum_weights = sum(current_weights)
-
-    if sum_weights <= 0:
-        logger.warning(
-            "Sum of all weights cant be less than zero. Using even distribution."
-        )
-        current_weights = [1.0] * len(candidates)
-
-    return random.choices(candidates, weights=current_weights, k=1)[0]
-
-
 @app.get("/health")
 def health():
     """Endpoint to probe the circuit breaker states and weights."""
@@ -166,52 +286,112 @@ def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
-@app.post("/ingest")
-async def ingest(packet: LogPacket):
+PROTOBUF_CONTENT_TYPE = "application/x-protobuf"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+
+def packet_from_dict(document: dict) -> logs_pb2.LogPacket:
+    """
+    Build a LogPacket from a decoded JSON or msgpack body.
+
+    Same contract as the old Pydantic models: timestamp and message are
+    required, level defaults to "INFO" and source_id to "sim", and none of
+    those four may be null. Each message is written straight into the repeated
+    field via messages.add(), and attrs is only touched when it is non-empty.
+    """
+    source_id = document.get("source_id", "sim")
+    if source_id is None:
+        # LogPacket(source_id=None) would quietly mean "", unlike a null level
+        raise ValueError("source_id must not be null")
+    packet = logs_pb2.LogPacket(source_id=source_id)
+    add = packet.messages.add
+    for message in document["messages"]:
+        log_message = add()
+        log_message.timestamp = message["timestamp"]
+        log_message.level = message.get("level", "INFO")
+        log_message.message = message["message"]
+        attrs = message.get("attrs")
+        if attrs:
+            log_message.attrs.update(attrs)
+    return packet
+
+
+def parse_packet(content_type: str, body: bytes) -> logs_pb2.LogPacket:
+    """
+    Decode an /ingest body into a LogPacket.
+
+    application/x-protobuf bodies are already in wire format, so
+    ParseFromString() is the whole decode. application/msgpack bodies are
+    unpacked with msgpack and anything else is treated as JSON and decoded with
+    orjson; both are then copied in by packet_from_dict().
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    try:
+        if media_type == PROTOBUF_CONTENT_TYPE:
+            packet = logs_pb2.LogPacket()
+            packet.ParseFromString(body)
+            return packet
+        if media_type == MSGPACK_CONTENT_TYPE:
+            document = msgpack.unpackb(body)
+        else:
+            document = orjson.loads(body)
+        if not isinstance(document, dict):
+            raise HTTPException(status_code=422, detail="expected an object")
+        return packet_from_dict(document)
+    except (orjson.JSONDecodeError, DecodeError) as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    except KeyError as error:
+        raise HTTPException(status_code=422, detail=f"missing field {error}")
+    except (TypeError, ValueError, AttributeError) as error:
+        reason = str(error) or type(error).__name__  # msgpack errors may be bare
+        raise HTTPException(status_code=422, detail=f"invalid LogPacket: {reason}")
+
+
+@app.post("/ingest", responses={200: {"model": IngestAck}})
+async def ingest(request: Request):
     """
     Ingest a log packet and send it to an analyzer.
     Some analyzers may start failing as per simulations set in Web UI.
     We will adapt to success/failure rates via assigned Circuit Breaker.
+
+    The body (protobuf wire format, msgpack, or JSON for debugging) is parsed
+    straight into a logs_pb2.LogPacket, so there is no intermediate Pydantic
+    model to validate and then copy field by field, and the ack is returned as
+    pre-encoded bytes to skip response serialization.
     """
     ctx = app.state.ctx
-    candidates = list(ctx.analyzer_hosts.keys())
-    if not candidates:
+    # one table for the whole request, so indices stay valid if weights change
+    table = ctx.alias_table
+    if not table.names:
         raise HTTPException(
             status_code=503, detail="analyzer_hosts not yet initialized?"
         )
 
-    tried = set()
-    while len(tried) < len(candidates):
-        remaining = [c for c in candidates if c not in tried]
-        target = weighted_analyzer_choice(remaining)
-        tried.add(target)
+    req = parse_packet(request.headers.get("content-type", ""), await request.body())
+
+    # bit i set = table.names[i] already tried for this packet
+    all_tried = (1 << len(table.names)) - 1
+    tried_mask = 0
+    while tried_mask != all_tried:
+        index = table.pick_index_excluding(tried_mask)
+        tried_mask |= 1 << index
+        target = table.names[index]
 
         if not ctx.circuit_breakers[target].allow_request():
             continue
 
-        stub = ctx.stubs[target]
         try:
             # send the log to the chosen analyzer here
-            req = logs_pb2.LogPacket(
-                source_id=packet.source_id,
-                messages=[
-                    logs_pb2.LogMessage(
-                        timestamp=m.timestamp,
-                        level=m.level,
-                        message=m.message,
-                        attrs=m.attrs,
-                    )
-                    for m in packet.messages
-                ],
-            )
-
-            _ = await stub.Analyze(req, timeout=ANALYZER_TIMEOUT_MS / 1000.0)
+            _ = await ctx.batchers[target].submit(req)
             ctx.circuit_breakers[target].record_success()
-            SUCCESS.inc()
-            return {"accepted_by": target, "count": len(packet.messages)}
-        except AioRpcError:
+            PENDING_METRICS[SUCCESS] += 1
+            return Response(
+                orjson.dumps({"accepted_by": target, "count": len(req.messages)}),
+                media_type="application/json",
+            )
+        except (AioRpcError, IncompleteBatchError):
             # analyzer failed or unavailable
-            FAILURE.inc()
+            PENDING_METRICS[FAILURE] += 1
             ctx.circuit_breakers[target].record_failure()
             continue
 
@@ -0,0 +1,147 @@
+"""
+PacketBatcher
+
+Coalesces LogPackets bound for a single analyzer so that many /ingest calls
+share one streaming gRPC call instead of each paying for its own unary RPC
+(HTTP/2 HEADERS + DATA + trailers and server-side handler dispatch).
+
+Flow
+----
+- submit(packet) enqueues (packet, future) and awaits the future.
+- A background task takes the first queued packet, waits window_secs for
+  more to arrive, drains up to max_batch packets and hands them to
+  send_batch() in a separate task, so the next batch can start collecting
+  while the previous one is on the wire.
+- send_batch() returns one ack per packet, in order. Each caller's future is
+  resolved with its own ack. If send_batch() raises, every caller in that
+  batch sees the same exception; if it returns too few acks, the callers
+  without an ack get an IncompleteBatchError.
+- collect_acks() drains a streamed reply for send_batch(), keeping the acks
+  that arrived before a mid-stream failure so only the unacked packets fail.
+
+Configuration
+-------------
+name : str
+    Identifier for logs.
+send_batch : async callable
+    Takes a list of packets, returns a sequence of acks in the same order.
+window_secs : float, default=0.001
+    How long to wait for more packets after the first one arrives.
+max_batch : int, default=64
+    Upper bound on packets per send_batch() call.
+
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class IncompleteBatchError(RuntimeError):
+    """Raised for packets that did not receive an ack from send_batch()."""
+
+
+async def collect_acks(
+    stream: AsyncIterable[Any],
+    partial_errors: Tuple[Type[BaseException], ...],
+) -> List[Any]:
+    """
+    Read acks from a reply stream one at a time.
+
+    If the stream fails with one of partial_errors after some acks arrived,
+    return those acks instead of raising: their packets were already handled
+    and must not be retried elsewhere. A failure before the first ack is
+    re-raised.
+    """
+    acks: List[Any] = []
+    try:
+        async for ack in stream:
+            acks.append(ack)
+    except partial_errors:
+        if not acks:
+            raise
+        logger.info("stream_partial acks=%d", len(acks))
+    return acks
+
+
+class PacketBatcher:
+    def __init__(
+        self,
+        name,
+        send_batch: Callable[[List[Any]], Awaitable[Sequence[Any]]],
+        window_secs: float = 0.001,
+        max_batch: int = 64,
+    ) -> None:
+        self.name = name
+
+        if window_secs < 0:
+            raise ValueError("window_secs must be >= 0")
+        if max_batch <= 0:
+            raise ValueError("max_batch must be > 0")
+
+        self.send_batch = send_batch
+        self.window_secs = window_secs
+        self.max_batch = max_batch
+
+        self.queue: asyncio.Queue[Tuple[Any, asyncio.Future]] = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.inflight: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the background collector on the running event loop."""
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def submit(self, packet: Any) -> Any:
+        """Queue a packet for the next batch and return its ack."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((packet, future))
+        return await future
+
+    async def run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            if self.window_secs:
+                await asyncio.sleep(self.window_secs)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            task = asyncio.create_task(self.flush(batch))
+            self.inflight.add(task)
+            task.add_done_callback(self.inflight.discard)
+
+    async def flush(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            acks = await self.send_batch([packet for packet, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue  # caller went away
+            if index < len(acks):
+                future.set_result(acks[index])
+            else:
+                future.set_exception(
+                    IncompleteBatchError(
+                        f"{self.name} acked {len(acks)} of {len(batch)} packets"
+                    )
+                )
+        logger.debug("batch_flush name=%s size=%d", self.name, len(batch))
@@ -16,6 +16,11 @@ States
 Design notes
 -----------
 - Thread-safety: A per-instance Lock protects all state transitions and counters.
+  allow_request() reads state without the lock and only locks when an OPEN
+  breaker's cooldown may have elapsed (re-checked under the lock).
+  record_success() skips the lock entirely when CLOSED with no failures.
+- Hot path: BreakerState is an IntEnum and the class uses __slots__; state
+  names for logs/snapshots come from the _STATE_NAMES tuple.
 - Time source: time.monotonic() is used for cooldown timing.
 - Logging:
     * On every recorded failure, an INFO log "circuit_fail" includes a snapshot.
@@ -40,20 +45,35 @@ half_open_success_threshold : int, default=1
 from __future__ import annotations
 import time
 import logging
-import copy
-from enum import Enum
+from enum import IntEnum
 from threading import Lock
 
 logger = logging.getLogger(__name__)
 
 
-class BreakerState(str, Enum):
-    CLOSED = "closed"
-    OPEN = "open"
-    HALF_OPEN = "half_open"
+class BreakerState(IntEnum):
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+# Indexed by BreakerState; used for logs and snapshot()
+_STATE_NAMES = ("closed", "open", "half_open")
 
 
 class SimpleCircuitBreaker:
+    __slots__ = (
+        "name",
+        "failure_threshold",
+        "recovery_timeout",
+        "half_open_success_threshold",
+        "state",
+        "consecutive_failures",
+        "half_open_successes",
+        "opened_at",
+        "lock",
+    )
+
     def __init__(
         self,
         name,
@@ -83,23 +103,36 @@ class SimpleCircuitBreaker:
 
     def allow_request(self) -> bool:
         """Return True if a request should be attempted."""
+        # CLOSED and HALF_OPEN both allow attempts; no lock needed to say so.
+        if self.state is not BreakerState.OPEN:
+            return True
+        opened_at = self.opened_at
+        if (
+            opened_at is not None
+            and (time.monotonic() - opened_at) < self.recovery_timeout
+        ):
+            return False  # waiting longer after last failure
+
         with self.lock:
+            # re-check: another caller may have transitioned meanwhile
+            if self.state != BreakerState.OPEN:
+                return True
             now = time.monotonic()
-            if self.state == BreakerState.OPEN:
-                if (
-                    self.opened_at is not None
-                    and (now - self.opened_at) >= self.recovery_timeout
-                ):
-                    # transition to HALF_OPEN and allow a probe request
-                    prev = self.state
-                    self.transition(BreakerState.HALF_OPEN, reason="cooldown elapsed")
-                    self.half_open_successes = 0
-                    return True
-                return False  # waiting longer after last failure
-            # CLOSED and HALF_OPEN both allow attempts
-            return True
+            if (
+                self.opened_at is not None
+                and (now - self.opened_at) >= self.recovery_timeout
+            ):
+                # transition to HALF_OPEN and allow a probe request
+                self.transition(BreakerState.HALF_OPEN, reason="cooldown elapsed")
+                self.half_open_successes = 0
+                return True
+            return False
 
     def record_success(self) -> None:
+        # Common case: healthy breaker, nothing to reset, so skip the lock.
+        # A race with a concurrent failure costs at most one missed reset.
+        if self.state is BreakerState.CLOSED and self.consecutive_failures == 0:
+            return
         with self.lock:
             if self.state == BreakerState.HALF_OPEN:
                 self.half_open_successes += 1
@@ -116,7 +149,7 @@ class SimpleCircuitBreaker:
         logger.info(
             "circuit_fail name=%s state=%s consec_fail=%d snapshot=%s",
             self.name,
-            self.state.value,
+            _STATE_NAMES[self.state],
             self.consecutive_failures,
             self.snapshot(),
         )
@@ -126,7 +159,7 @@ class SimpleCircuitBreaker:
                 logger.info(
                     "circuit_trip name=%s from=%s reason=%s",
                     self.name,
-                    self.state.value,
+                    _STATE_NAMES[self.state],
                     "failure while half-open",
                 )
                 self.trip_open(reason="failure while half-open")
@@ -142,7 +175,7 @@ class SimpleCircuitBreaker:
                 logger.info(
                     "circuit_trip name=%s from=%s reason=%s",
                     self.name,
-                    self.state.value,
+                    _STATE_NAMES[self.state],
                     "failure threshold reached",
                 )
                 self.trip_open(reason="failure threshold reached")
@@ -161,14 +194,14 @@ class SimpleCircuitBreaker:
         self.transition(BreakerState.CLOSED, reason=reason)
 
     def transition(self, new_state: BreakerState, reason: str) -> None:
-        previous_state = copy.copy(self.state)
+        previous_state = self.state
         self.state = new_state
         logger.info(
             "circuit_state_change name=%s from=%s to=%s reason=%s failure_threshold=%d "
             "recovery_timeout=%.3f half_open_success_threshold=%d",
             self.name,
-            previous_state.value,
-            new_state.value,
+            _STATE_NAMES[previous_state],
+            _STATE_NAMES[new_state],
             reason,
             self.failure_threshold,
             self.recovery_timeout,
@@ -179,7 +212,7 @@ class SimpleCircuitBreaker:
         with self.lock:
             return {
                 "name": self.name,
-                "state": self.state.value,
+                "state": _STATE_NAMES[self.state],
                 "consecutive_failures": self.consecutive_failures,
                 "half_open_successes": self.half_open_successes,
                 "opened_for_secs": (
@@ -0,0 +1,48 @@
+import random
+import pytest
+
+from app.alias_table import AliasTable, build_alias_table
+
+
+def test_alias_table_matches_weights():
+    random.seed(7)
+    table = AliasTable(["a", "b", "c", "d"], [0.4, 0.3, 0.2, 0.1])
+    counts = {n: 0 for n in table.names}
+    for _ in range(40000):
+        counts[table.pick()] += 1
+    assert counts["a"] / 40000 == pytest.approx(0.4, abs=0.02)
+    assert counts["d"] / 40000 == pytest.approx(0.1, abs=0.02)
+
+
+def test_zero_weight_is_never_picked():
+    random.seed(1)
+    table = AliasTable(["a", "b"], [1.0, 0.0])
+    assert {table.pick() for _ in range(1000)} == {"a"}
+
+
+def test_all_zero_weights_fall_back_to_even():
+    prob, alias = build_alias_table([0.0, -1.0, 0.0])
+    assert prob == [1.0, 1.0, 1.0]
+
+
+def test_mismatched_lengths_rejected():
+    with pytest.raises(ValueError):
+        AliasTable(["a"], [1.0, 2.0])
+
+
+def test_pick_excluding_skips_masked_and_keeps_proportions():
+    random.seed(3)
+    table = AliasTable(["a", "b", "c"], [0.7, 0.2, 0.1])
+    counts = {n: 0 for n in table.names}
+    for _ in range(30000):
+        counts[table.names[table.pick_index_excluding(0b001)]] += 1
+    assert counts["a"] == 0
+    assert counts["b"] / 30000 == pytest.approx(2 / 3, abs=0.02)
+
+
+def test_pick_excluding_falls_back_when_only_zero_weights_remain():
+    random.seed(5)
+    table = AliasTable(["a", "b", "c"], [1.0, 0.0, 0.0])
+    assert {table.pick_index_excluding(0b001) for _ in range(200)} == {1, 2}
+    with pytest.raises(ValueError):
+        table.pick_index_excluding(0b111)
@@ -0,0 +1,95 @@
+import msgpack
+import orjson
+import pytest
+
+# needs the protoc-generated logs_pb2 (built into the image, not checked in)
+pytest.importorskip("app.logs_pb2")
+
+from fastapi import HTTPException
+
+from app import logs_pb2
+from app.main import parse_packet
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+PROTOBUF = "application/x-protobuf"
+
+MESSAGE = {"timestamp": "2024-01-01T00:00:00", "message": "hello"}
+
+
+def decode_json(document):
+    return parse_packet(JSON, orjson.dumps(document))
+
+
+def assert_rejected(content_type, body):
+    with pytest.raises(HTTPException) as info:
+        parse_packet(content_type, body)
+    assert info.value.status_code == 422
+    return info.value.detail
+
+
+def test_json_applies_defaults():
+    packet = decode_json({"messages": [MESSAGE]})
+    assert packet.source_id == "sim"
+    assert packet.messages[0].level == "INFO"
+    assert packet.messages[0].timestamp == MESSAGE["timestamp"]
+    assert packet.messages[0].message == "hello"
+    assert dict(packet.messages[0].attrs) == {}
+
+
+def test_json_keeps_given_fields():
+    message = dict(MESSAGE, level="WARN", attrs={"k": "v"})
+    packet = decode_json({"source_id": "s1", "messages": [message]})
+    assert packet.source_id == "s1"
+    assert packet.messages[0].level == "WARN"
+    assert dict(packet.messages[0].attrs) == {"k": "v"}
+
+
+def test_msgpack_matches_json():
+    document = {"source_id": "s1", "messages": [MESSAGE, dict(MESSAGE, level="ERROR")]}
+    assert parse_packet(MSGPACK, msgpack.packb(document)) == decode_json(document)
+
+
+def test_protobuf_is_parsed_as_is():
+    packet = logs_pb2.LogPacket(source_id="s1")
+    packet.messages.add(timestamp="t", level="DEBUG", message="m")
+    body = packet.SerializeToString()
+    assert parse_packet(PROTOBUF, body) == packet
+    assert parse_packet("Application/X-Protobuf; charset=binary", body) == packet
+
+
+@pytest.mark.parametrize("field", ["timestamp", "message"])
+def test_missing_required_field_is_rejected(field):
+    message = {k: v for k, v in MESSAGE.items() if k != field}
+    detail = assert_rejected(JSON, orjson.dumps({"messages": [message]}))
+    assert field in detail
+
+
+def test_missing_messages_is_rejected():
+    assert_rejected(JSON, orjson.dumps({"source_id": "s1"}))
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {"source_id": None, "messages": [MESSAGE]},
+        {"messages": [dict(MESSAGE, level=None)]},
+        {"messages": [dict(MESSAGE, timestamp=None)]},
+    ],
+)
+def test_null_fields_are_rejected(document):
+    assert_rejected(JSON, orjson.dumps(document))
+
+
+@pytest.mark.parametrize("content_type", [JSON, MSGPACK])
+def test_non_object_body_is_rejected(content_type):
+    body = orjson.dumps([MESSAGE]) if content_type == JSON else msgpack.packb([MESSAGE])
+    assert assert_rejected(content_type, body) == "expected an object"
+
+
+@pytest.mark.parametrize(
+    "content_type, body",
+    [(JSON, b"{not json"), (MSGPACK, b"\xc1"), (PROTOBUF, b"\xff\xff\xff")],
+)
+def test_malformed_body_is_rejected(content_type, body):
+    assert_rejected(content_type, body)
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+
+from app.packet_batcher import PacketBatcher, IncompleteBatchError, collect_acks
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    async def send_batch(packets):
+        calls.append(list(packets))
+        return [f"ack-{p}" for p in packets]
+
+    async def scenario():
+        batcher = PacketBatcher("t", send_batch, window_secs=0.01)
+        batcher.start()
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    acks = run(scenario())
+    assert acks == [f"ack-{i}" for i in range(5)]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_max_batch_splits_sends():
+    calls = []
+
+    async def send_batch(packets):
+        calls.append(list(packets))
+        return list(packets)
+
+    async def scenario():
+        batcher = PacketBatcher("t", send_batch, window_secs=0.01, max_batch=2)
+        batcher.start()
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert run(scenario()) == [0, 1, 2, 3, 4]
+    assert [len(c) for c in calls] == [2, 2, 1]
+
+
+def test_send_failure_reaches_every_caller():
+    async def send_batch(packets):
+        raise ConnectionError("analyzer down")
+
+    async def scenario():
+        batcher = PacketBatcher("t", send_batch, window_secs=0.01)
+        batcher.start()
+        return await asyncio.gather(
+            *(batcher.submit(i) for i in range(3)), return_exceptions=True
+        )
+
+    results = run(scenario())
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_missing_acks_raise_incomplete_batch():
+    async def send_batch(packets):
+        return packets[:1]
+
+    async def scenario():
+        batcher = PacketBatcher("t", send_batch, window_secs=0.01)
+        batcher.start()
+        return await asyncio.gather(
+            *(batcher.submit(i) for i in range(2)), return_exceptions=True
+        )
+
+    first, second = run(scenario())
+    assert first == 0
+    assert isinstance(second, IncompleteBatchError)
+
+
+def test_rejects_bad_config():
+    with pytest.raises(ValueError):
+        PacketBatcher("t", None, window_secs=-1)
+    with pytest.raises(ValueError):
+        PacketBatcher("t", None, max_batch=0)
+
+
+async def acks_then_failure(count):
+    for i in range(count):
+        yield f"ack-{i}"
+    raise ConnectionError("stream reset")
+
+
+def test_partial_acks_survive_stream_failure():
+    async def send_batch(packets):
+        return await collect_acks(acks_then_failure(2), (ConnectionError,))
+
+    async def scenario():
+        batcher = PacketBatcher("t", send_batch, window_secs=0.01)
+        batcher.start()
+        return await asyncio.gather(
+            *(batcher.submit(i) for i in range(4)), return_exceptions=True
+        )
+
+    results = run(scenario())
+    assert results[:2] == ["ack-0", "ack-1"]
+    assert all(isinstance(r, IncompleteBatchError) for r in results[2:])
+
+
+def test_stream_failure_before_any_ack_is_raised():
+    with pytest.raises(ConnectionError):
+        run(collect_acks(acks_then_failure(0), (ConnectionError,)))
@@ -57,3 +57,22 @@ def test_half_open_failure_reopens():
     assert cb.allow_request()  # -> HALF_OPEN
     cb.record_failure()  # any failure in HALF_OPEN -> OPEN
     assert cb.state == BreakerState.OPEN
+
+
+def test_snapshot_reports_state_names():
+    cb = SimpleCircuitBreaker("t", failure_threshold=1, recovery_timeout=0.02)
+    cb.record_failure()  # -> OPEN
+    assert cb.snapshot()["state"] == "open"
+    time.sleep(0.03)
+    assert cb.allow_request()  # -> HALF_OPEN
+    assert cb.snapshot()["state"] == "half_open"
+
+
+def test_success_resets_failures_when_closed():
+    cb = SimpleCircuitBreaker("t", failure_threshold=3, recovery_timeout=0.05)
+    cb.record_failure()
+    cb.record_failure()
+    cb.record_success()
+    assert cb.consecutive_failures == 0
+    cb.record_success()  # lock-free no-op path
+    assert cb.state == BreakerState.CLOSED
@@ -1,46 +1,70 @@
 """
 Ingest Traffic Simulator
 
-A small multi-process HTTP load generator for the log distributor's
-/ingest endpoint. It spawns N worker processes; each worker posts
-randomized log packets at a fixed QPS rate.
+A small HTTP load generator for the log distributor's /ingest endpoint. It
+runs N virtual workers as coroutines on one uvloop event loop; each posts
+randomized log packets at a fixed QPS rate, keeping many requests in flight at
+once over a single shared aiohttp session.
 
 What it does
 ------------
-- Spawns WORKERS processes (daemon=True).
+- Runs WORKERS worker coroutines in a single process.
 - Each worker:
   * Builds a packet of K messages
   * Each message has: timestamp (local, '%Y-%m-%dT%H:%M:%S'), level='INFO',
     message=random ASCII text, attrs={} (empty dict).
-  * POSTs JSON to TARGET with shape:
+  * POSTs it to TARGET as a serialized logs.LogPacket
+    (content-type: application/x-protobuf), or with shape:
       {"source_id": "...", "messages": [ ... ]}
-  * Sleeps to maintain QPS_PER_WORKER requests/sec.
+    as JSON when PAYLOAD_FORMAT=json, or msgpack when PAYLOAD_FORMAT=msgpack.
+  * Starts a POST every 1/QPS_PER_WORKER seconds on a fixed schedule without
+    waiting for the response, so a slow reply doesn't stall the send rate. At
+    most MAX_IN_FLIGHT requests per worker are outstanding at a time.
 
 Environment variables
 ---------------------
 - TARGET (str): URL to POST, default "http://distributor:8000/ingest".
 - PACKET_MIN (int): Minimum messages per packet, default 5.
 - PACKET_MAX (int): Maximum messages per packet, default 20.
-- WORKERS (int): Number of OS processes to spawn, default 4.
+- WORKERS (int): Number of worker coroutines to run, default 4.
 - QPS_PER_WORKER (float): Requests per second per worker, default 25.0.
+- PAYLOAD_FORMAT (str): "protobuf" (default), "msgpack", or "json" for easier
+  debugging.
+- MAX_IN_FLIGHT (int): Concurrent outstanding requests per worker, default 64.
+- BATCH_INTERVAL_MS (float): If > 0, coalesce the packets due in each interval
+  into one POST (same message rate, fewer requests), default 0 (off).
 
 """
 
+import asyncio
 import multiprocessing
 import os, time, random, string
-import httpx
-from multiprocessing import Process
+import aiohttp
+import uvloop
+import msgspec
+import numpy as np
 import logging
 import sys
+from typing import Dict, List
+
+import logs_pb2
 
 TARGET = os.environ.get("TARGET", "http://distributor:8000/ingest")
 PACKET_MIN = int(os.environ.get("PACKET_MIN", "5"))
 PACKET_MAX = int(os.environ.get("PACKET_MAX", "20"))
 WORKERS = int(os.environ.get("WORKERS", "4"))
+PAYLOAD_FORMAT = os.environ.get("PAYLOAD_FORMAT", "protobuf")
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "64"))
+BATCH_INTERVAL_MS = float(os.environ.get("BATCH_INTERVAL_MS", "0"))
 
 # an target QPS for the worker, not exact
 QPS_PER_WORKER = float(os.environ.get("QPS_PER_WORKER", multiprocessing.cpu_count()))
 
+# With BATCH_INTERVAL_MS set, each POST carries this many packets' worth of
+# messages (a worker's packets all share one source_id) and POSTs go out that
+# many times less often, so the message rate is unchanged.
+PACKETS_PER_POST = max(1, round(QPS_PER_WORKER * BATCH_INTERVAL_MS / 1000.0))
+
 logging.basicConfig(
     stream=sys.stdout,
     level=logging.INFO,
@@ -50,44 +74,147 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def rand_msg():
-    n = random.randint(20, 80)
-    return "".join(random.choices(string.ascii_letters + string.digits + " ", k=n))
+JSON_HEADERS = {"content-type": "application/json"}
+MSGPACK_HEADERS = {"content-type": "application/msgpack"}
+PROTOBUF_HEADERS = {"content-type": "application/x-protobuf"}
 
 
-def worker_loop(i):
-    client = httpx.Client(timeout=5.0)
-    interval = 1.0 / QPS_PER_WORKER
-    try:
-        while True:
-            k = random.randint(PACKET_MIN, PACKET_MAX)
-            msgs = [
-                {
-                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
-                    "level": "INFO",
-                    "message": rand_msg(),
-                    "attrs": {},
-                }
-                for _ in range(k)
-            ]
-            try:
-                client.post(TARGET, json={"source_id": f"sim-{i}", "messages": msgs})
-            except Exception as e:
-                logger.warning("Worker %s failed to post: %s", i, e)
-
-            time.sleep(interval)
-    finally:
-        client.close()
+# Fixed-shape mirrors of logs.LogPacket for the JSON and msgpack formats; msgspec
+# compiles a specialized encoder for them instead of walking generic dicts.
+class LogMessage(msgspec.Struct):
+    timestamp: str
+    level: str
+    message: str
+    attrs: Dict[str, str]
+
+
+class LogPacket(msgspec.Struct):
+    source_id: str
+    messages: List[LogMessage]
+
+
+JSON_ENCODER = msgspec.json.Encoder()
+MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+EMPTY_ATTRS: Dict[str, str] = {}  # shared by every message, never mutated
+
+
+# Messages are random windows into one pre-generated pool, so a message costs a
+# slice instead of a random.choices() call per character. The pool is random
+# bytes from os.urandom mapped onto the alphabet with one bytes.translate() call;
+# the 63-char alphabet is padded to 64 with an extra space so `b & 63` indexes it.
+MSG_MIN_CHARS, MSG_MAX_CHARS = 20, 80
+TEXT_POOL_SIZE = 1 << 20
+ALPHABET = (string.ascii_letters + string.digits + "  ").encode("ascii")
+TRANSLATE_TABLE = bytes(ALPHABET[b & 63] for b in range(256))
+TEXT_POOL = os.urandom(TEXT_POOL_SIZE).translate(TRANSLATE_TABLE).decode("ascii")
+
+# PCG64 Generator: faster than the legacy global RandomState (MT19937) behind
+# np.random.randint, and seeded from OS entropy
+RNG = np.random.default_rng()
+
+# strftime is only re-run when the wall-clock second changes
+_ts_sec = 0
+_ts_str = ""
 
 
-def worker(i):
-    worker_loop(i)
+def timestamp():
+    global _ts_sec, _ts_str
+    now = int(time.time())
+    if now != _ts_sec:
+        _ts_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now))
+        _ts_sec = now
+    return _ts_str
+
+
+def rand_msgs(k):
+    """k random messages; all lengths and offsets come from two NumPy draws."""
+    lengths = RNG.integers(MSG_MIN_CHARS, MSG_MAX_CHARS + 1, k).tolist()
+    starts = RNG.integers(0, TEXT_POOL_SIZE - MSG_MAX_CHARS, k).tolist()
+    return [TEXT_POOL[s : s + n] for s, n in zip(starts, lengths)]
+
+
+def packet_size():
+    """Messages in one POST: PACKET_MIN..PACKET_MAX for each coalesced packet."""
+    if PACKETS_PER_POST == 1:
+        return random.randint(PACKET_MIN, PACKET_MAX)
+    return int(RNG.integers(PACKET_MIN, PACKET_MAX + 1, PACKETS_PER_POST).sum())
+
+
+def build_body(i):
+    """Return (body, headers) for one randomized packet in PAYLOAD_FORMAT."""
+    k = packet_size()
+    ts = timestamp()
+    if PAYLOAD_FORMAT in ("json", "msgpack"):
+        packet = LogPacket(
+            f"sim-{i}",
+            [LogMessage(ts, "INFO", message, EMPTY_ATTRS) for message in rand_msgs(k)],
+        )
+        if PAYLOAD_FORMAT == "msgpack":
+            return MSGPACK_ENCODER.encode(packet), MSGPACK_HEADERS
+        return JSON_ENCODER.encode(packet), JSON_HEADERS
+
+    # protobuf wire format: the distributor decodes it with one ParseFromString
+    packet = logs_pb2.LogPacket(source_id=f"sim-{i}")
+    for message in rand_msgs(k):
+        packet.messages.add(timestamp=ts, level="INFO", message=message)
+    return packet.SerializeToString(), PROTOBUF_HEADERS
+
+
+async def post_one(session, semaphore, i, body, headers):
+    try:
+        # the ack is never inspected, so leave its body unread; aiohttp still
+        # returns the connection to the pool once the small response is in
+        async with session.post(TARGET, data=body, headers=headers):
+            pass
+    except Exception as e:
+        logger.warning("Worker %s failed to post: %s", i, e)
+    finally:
+        semaphore.release()
+
+
+async def worker_loop(i, session):
+    interval = PACKETS_PER_POST / QPS_PER_WORKER
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+    in_flight = set()
+    loop = asyncio.get_running_loop()
+    next_send = loop.time()
+    while True:
+        await semaphore.acquire()
+        body, headers = build_body(i)
+        task = asyncio.create_task(post_one(session, semaphore, i, body, headers))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        # Pace against a fixed schedule, so time spent building bodies or
+        # waiting on the semaphore doesn't stretch the interval. After a
+        # stall of more than a second, restart the schedule rather than burst.
+        next_send += interval
+        delay = next_send - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif delay < -1.0:
+            next_send = loop.time()
+
+
+async def main():
+    # One pooled connection per in-flight request to the (single) target host,
+    # shared by every worker and kept warm for 60s so steady traffic never
+    # re-handshakes; the distributor keeps idle connections for 75s, so the
+    # client always closes first and never reuses a dying socket. DNS for
+    # TARGET is cached for 5 minutes.
+    connector = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=MAX_IN_FLIGHT * WORKERS,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=True,
+        keepalive_timeout=60,
+    )
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=5.0)
+    ) as session:
+        await asyncio.gather(*(worker_loop(i, session) for i in range(WORKERS)))
 
 
 if __name__ == "__main__":
-    procs = [Process(target=worker, args=(i,), daemon=True) for i in range(WORKERS)]
     logger.info("Starting %d workers with QPS %f", WORKERS, QPS_PER_WORKER)
-    for p in procs:
-        p.start()
-    for p in procs:
-        p.join()
+    # libuv-backed loop: cheaper socket polling and timers than asyncio's default
+    uvloop.run(main())
@@ -9,9 +9,13 @@ Minimal Dash web UI for the log distributor demo.
 from __future__ import annotations
 
 import logging
+import time
+from typing import Dict, List
 
-from dash import Dash, html, dcc, Input, Output, State
+from dash import Dash, html, dcc, Input, Output, State, ALL, callback_context, no_update
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
+from pymongo import UpdateOne
 from pymongo.errors import PyMongoError
 
 from app.helpers import (
@@ -22,9 +26,12 @@ from app.helpers import (
     ANALYZERS_COL,
     WEIGHTS_COL,
     get_states_and_weights,
-    graylog_count,
-    fetch_breakers,
+    poll_all,
+    breaker_cell_id,
+    breaker_cell_text,
     render_breaker_table,
+    CONTROL_ROW_STYLE,
+    CONTROL_NAME_STYLE,
     analyzer_state_control,
     DISTRIBUTOR_API,
 )
@@ -33,6 +40,66 @@ APP = Dash(__name__)
 APP.title = "Log Distribution Dashboard"
 LOGGER = logging.getLogger("webapp.app")
 
+# Last known analyzer ON/OFF states in Mongo, reused by on_state_change for a
+# short while so a burst of toggles doesn't re-read the collection every time.
+STATE_CACHE_TTL_SECS = 2.0
+_LAST_STATES: Dict[str, bool] = {}
+_LAST_STATES_TS = 0.0
+
+# Layout styles, built once instead of on every page load
+PAGE_STYLE = {
+    "backgroundColor": "#111",
+    "color": "#eee",
+    "minHeight": "100vh",
+    "padding": "20px",
+}
+TITLE_STYLE = {"textAlign": "center"}
+COLUMNS_STYLE = {"display": "flex", "gap": "30px"}
+CHART_COLUMN_STYLE = {"flex": "1", "minWidth": "480px"}
+BREAKER_PANEL_STYLE = {
+    "marginTop": "12px",
+    "padding": "12px",
+    "background": "#222",
+    "borderRadius": "8px",
+}
+CONTROLS_PANEL_STYLE = {
+    "width": "420px",
+    "padding": "12px",
+    "background": "#222",
+    "borderRadius": "8px",
+}
+RADIO_LABEL_STYLE = {"marginRight": "12px"}
+WEIGHT_LABEL_STYLE = {"marginRight": "10px"}
+STATE_STATUS_STYLE = {"marginTop": "6px", "color": "#aaa"}
+SAVE_STATUS_STYLE = {"marginTop": "8px", "color": "#aaa"}
+
+# The breaker panel's help text and table skeleton never change; update_breakers
+# only rewrites the table's per-analyzer cells.
+BREAKER_PANEL = [
+    html.Div(
+        [
+            html.Div(
+                "Circuit Breakers", style={"fontWeight": "700", "marginBottom": "8px"}
+            ),
+            html.Div(
+                [
+                    "Live view of distributor /health — updates every refresh interval.",
+                    html.Br(),
+                    "• State = current breaker mode for this analyzer (closed=open for traffic, open=blocked, half_open=trial mode).",
+                    html.Br(),
+                    "• Failures = consecutive recent failures recorded by this breaker.",
+                    html.Br(),
+                    "• Reopen In = seconds until the next half-open probe is allowed (0 if already eligible).",
+                    html.Br(),
+                    "State is based on a single Gunicorn worker.",
+                ],
+                style={"color": "#aaa", "fontSize": "12px", "marginBottom": "8px"},
+            ),
+        ]
+    ),
+    render_breaker_table(),
+]
+
 
 def serve_layout():
     """Build and return the app layout with current analyzer states and weights."""
@@ -43,14 +110,9 @@ def serve_layout():
     for analyzer_name in ANALYZERS:
         analyzer_controls.append(
             html.Div(
-                style={
-                    "display": "flex",
-                    "alignItems": "center",
-                    "justifyContent": "space-between",
-                    "margin": "6px 0",
-                },
+                style=CONTROL_ROW_STYLE,
                 children=[
-                    html.Div(analyzer_name, style={"fontWeight": "600"}),
+                    html.Div(analyzer_name, style=CONTROL_NAME_STYLE),
                     dcc.RadioItems(
                         id=f"state-{analyzer_name}",
                         options=[
@@ -63,7 +125,7 @@ def serve_layout():
                             else "off"
                         ),
                         inline=True,
-                        labelStyle={"marginRight": "12px"},
+                        labelStyle=RADIO_LABEL_STYLE,
                     ),
                 ],
             )
@@ -71,14 +133,9 @@ def serve_layout():
 
     weights_controls = [
         html.Div(
-            style={
-                "display": "flex",
-                "alignItems": "center",
-                "justifyContent": "space-between",
-                "margin": "6px 0",
-            },
+            style=CONTROL_ROW_STYLE,
             children=[
-                html.Label(analyzer_name, style={"marginRight": "10px"}),
+                html.Label(analyzer_name, style=WEIGHT_LABEL_STYLE),
                 dcc.Input(
                     id=f"w-{analyzer_name}",
                     type="number",
@@ -92,32 +149,23 @@ def serve_layout():
     ]
 
     return html.Div(
-        style={
-            "backgroundColor": "#111",
-            "color": "#eee",
-            "minHeight": "100vh",
-            "padding": "20px",
-        },
+        style=PAGE_STYLE,
         children=[
             html.H2(
                 f"Data Ingestion Distribution (last {WINDOW_SECS} sec)",
-                style={"textAlign": "center"},
+                style=TITLE_STYLE,
             ),
             html.Div(
-                style={"display": "flex", "gap": "30px"},
+                style=COLUMNS_STYLE,
                 children=[
                     html.Div(
-                        style={"flex": "1", "minWidth": "480px"},
+                        style=CHART_COLUMN_STYLE,
                         children=[
                             dcc.Graph(id="bar-chart"),
                             html.Div(
                                 id="breaker-panel",
-                                style={
-                                    "marginTop": "12px",
-                                    "padding": "12px",
-                                    "background": "#222",
-                                    "borderRadius": "8px",
-                                },
+                                children=BREAKER_PANEL,
+                                style=BREAKER_PANEL_STYLE,
                             ),
                             dcc.Interval(
                                 id="refresh", interval=REFRESH_MS, n_intervals=0
@@ -125,12 +173,7 @@ def serve_layout():
                         ],
                     ),
                     html.Div(
-                        style={
-                            "width": "420px",
-                            "padding": "12px",
-                            "background": "#222",
-                            "borderRadius": "8px",
-                        },
+                        style=CONTROLS_PANEL_STYLE,
                         children=[
                             html.H4("Simulate Analyzer Failures (toggle ON/OFF)"),
                             html.Div(
@@ -138,7 +181,7 @@ def serve_layout():
                             ),
                             html.Div(
                                 id="state-status",
-                                style={"marginTop": "6px", "color": "#aaa"},
+                                style=STATE_STATUS_STYLE,
                             ),
                             html.Hr(),
                             html.H4("Set Weights and Observe Distribution"),
@@ -146,7 +189,7 @@ def serve_layout():
                             html.Button("Save Weights", id="save-btn", n_clicks=0),
                             html.Div(
                                 id="save-status",
-                                style={"marginTop": "8px", "color": "#aaa"},
+                                style=SAVE_STATUS_STYLE,
                             ),
                         ],
                     ),
@@ -167,7 +210,7 @@ def update_chart(n_intervals: int):
     Trigger: periodic interval.
     Returns: Plotly Figure with counts over the configured WINDOW_SECS window.
     """
-    message_counts = [graylog_count(analyzer_name) for analyzer_name in ANALYZERS]
+    message_counts, _ = poll_all()
     LOGGER.info("[CHART] counts=%s (last %ss)", message_counts, WINDOW_SECS)
     figure = go.Figure(
         data=[
@@ -186,36 +229,50 @@ def update_chart(n_intervals: int):
     return figure
 
 
-@APP.callback(Output("breaker-panel", "children"), Input("refresh", "n_intervals"))
-def update_breakers(n_intervals: int):
+@APP.callback(
+    Output(breaker_cell_id(ALL, ALL), "children"),
+    Input("refresh", "n_intervals"),
+    State(breaker_cell_id(ALL, ALL), "children"),
+)
+def update_breakers(n_intervals: int, shown_cells: List[str]):
     """
-    Refresh the circuit-breaker panel from distributor /health and render a centered table.
-    Adds back the original detailed help text for interpreting breaker state.
+    Refresh the breaker table's cells from distributor /health.
+
+    Only cells whose text differs from what the page already shows are sent back;
+    the rest of the table is static and never leaves the browser.
     """
-    breaker_status_map = fetch_breakers()
-    header_block = html.Div(
-        [
-            html.Div(
-                "Circuit Breakers", style={"fontWeight": "700", "marginBottom": "8px"}
-            ),
-            html.Div(
-                [
-                    "Live view of distributor /health — updates every refresh interval.",
-                    html.Br(),
-                    "• State = current breaker mode for this analyzer (closed=open for traffic, open=blocked, half_open=trial mode).",
-                    html.Br(),
-                    "• Failures = consecutive recent failures recorded by this breaker.",
-                    html.Br(),
-                    "• Reopen In = seconds until the next half-open probe is allowed (0 if already eligible).",
-                    html.Br(),
-                    "State is based on a single Gunicorn worker.",
-                ],
-                style={"color": "#aaa", "fontSize": "12px", "marginBottom": "8px"},
-            ),
-        ]
-    )
-    table = render_breaker_table(breaker_status_map)
-    return html.Div([header_block, table])
+    _, breaker_status_map = poll_all()
+    cell_ids = [output["id"] for output in callback_context.outputs_list]
+    new_cells = [
+        breaker_cell_text(breaker_status_map, cell_id["name"], cell_id["field"])
+        for cell_id in cell_ids
+    ]
+    if new_cells == shown_cells:
+        raise PreventUpdate
+    return [
+        no_update if new == shown else new for new, shown in zip(new_cells, shown_cells)
+    ]
+
+
+def mongo_states() -> Dict[str, bool]:
+    """Current {analyzer: active} from Mongo, cached for STATE_CACHE_TTL_SECS."""
+    global _LAST_STATES_TS
+    if time.monotonic() - _LAST_STATES_TS < STATE_CACHE_TTL_SECS:
+        return dict(_LAST_STATES)
+
+    # Default to True if missing; only name/active are needed from each doc
+    states = {
+        doc["name"]: bool(doc.get("active", True))
+        for doc in ANALYZERS_COL.find(
+            {"name": {"$in": ANALYZERS}}, {"_id": 0, "name": 1, "active": 1}
+        )
+    }
+    for analyzer_name in ANALYZERS:
+        states.setdefault(analyzer_name, True)
+    _LAST_STATES.clear()
+    _LAST_STATES.update(states)
+    _LAST_STATES_TS = time.monotonic()
+    return states
 
 
 @APP.callback(
@@ -236,13 +293,8 @@ def on_state_change(*radio_values: str):
             zip(ANALYZERS, (value == "on" for value in radio_values))
         )
 
-        # Current Mongo state (default to True if missing)
-        mongo_states_now = {
-            doc["name"]: bool(doc.get("active", True))
-            for doc in ANALYZERS_COL.find({"name": {"$in": ANALYZERS}})
-        }
-        for analyzer_name in ANALYZERS:
-            mongo_states_now.setdefault(analyzer_name, True)
+        # Current Mongo state (possibly from the short-lived cache)
+        mongo_states_now = mongo_states()
 
         # Diff to find only the toggles that changed
         changed_pairs = [
@@ -251,17 +303,24 @@ def on_state_change(*radio_values: str):
             if incoming_states.get(analyzer_name) != mongo_states_now.get(analyzer_name)
         ]
 
-        # Apply only the changes
-        for analyzer_name, is_active in changed_pairs:
-            ANALYZERS_COL.update_one(
-                {"name": analyzer_name},
-                {"$set": {"active": bool(is_active)}},
-                upsert=True,
-            )
-
         if not changed_pairs:
             return "No analyzer state change detected."
 
+        # Apply only the changes, all in one round trip
+        ANALYZERS_COL.bulk_write(
+            [
+                UpdateOne(
+                    {"name": analyzer_name},
+                    {"$set": {"active": bool(is_active)}},
+                    upsert=True,
+                )
+                for analyzer_name, is_active in changed_pairs
+            ],
+            ordered=False,
+        )
+        for analyzer_name, is_active in changed_pairs:
+            _LAST_STATES[analyzer_name] = bool(is_active)
+
         if len(changed_pairs) == 1:
             single_name, single_val = changed_pairs[0]
             return (
@@ -4,6 +4,8 @@ Helpers for the Log Distribution Dashboard.
 - Loads/stores analyzer ON/OFF state and weights in MongoDB.
 - Queries Graylog for recent message counts per analyzer.
 - Fetches distributor /health and normalizes circuit breaker info.
+- Polls both concurrently for each UI refresh (poll_all).
+- Runs that HTTP I/O on one asyncio loop thread with a shared httpx.AsyncClient.
 - Renders small UI fragments used by the Dash app (e.g., breaker table, analyzer toggle).
 """
 
@@ -11,12 +13,16 @@ from __future__ import annotations
 
 import os
 import sys
+import asyncio
+import time
 import logging
-from typing import Dict, Tuple, List
+import functools
+import threading
+from typing import Awaitable, Callable, Dict, Tuple, List, TypeVar
 
-import requests
-from requests.exceptions import RequestException
-from pymongo import MongoClient
+import httpx
+import orjson
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import PyMongoError
 from dash import html
 
@@ -30,6 +36,34 @@ DISTRIBUTOR_API: str = os.environ.get(
 WINDOW_SECS: int = int(os.environ.get("WINDOW_SECS", "3"))  # search window for counts
 REFRESH_MS: int = int(os.environ.get("REFRESH_MS", "1000"))  # UI refresh interval
 ANALYZERS: List[str] = ["analyzer1", "analyzer2", "analyzer3", "analyzer4"]
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "analyzer1": 0.4,
+    "analyzer2": 0.3,
+    "analyzer3": 0.2,
+    "analyzer4": 0.1,
+}
+# Breaker table columns that change between refreshes
+BREAKER_FIELDS: Tuple[str, ...] = ("state", "failures", "reopen_in")
+
+# Shared, read-only style dicts, so rendering doesn't rebuild them on every call
+CONTROL_ROW_STYLE = {
+    "display": "flex",
+    "alignItems": "center",
+    "justifyContent": "space-between",
+    "margin": "6px 0",
+}
+CONTROL_NAME_STYLE = {"fontWeight": "600"}
+TOGGLE_LABEL_STYLE = {"marginRight": "6px"}
+HIDDEN_STYLE = {"display": "none"}
+BREAKER_HEADER_STYLE = {"textAlign": "center", "padding": "6px"}
+BREAKER_CELL_STYLE = {"textAlign": "center", "padding": "6px"}
+BREAKER_TABLE_STYLE = {
+    "width": "100%",
+    "borderCollapse": "collapse",
+    "fontSize": "14px",
+}
+# Callbacks firing on the same refresh tick share one upstream response
+POLL_CACHE_SECS: float = REFRESH_MS / 2000.0
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -38,35 +72,65 @@ logging.basicConfig(
     force=True,
 )
 LOG = logging.getLogger("webapp.helpers")
+# httpx logs every request at INFO, i.e. five lines per UI refresh
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 MONGO_CLIENT = MongoClient(MONGO_URI)
 CONTROL_DB = MONGO_CLIENT.control
 ANALYZERS_COL = CONTROL_DB.analyzers  # {name: str, active: bool}
 WEIGHTS_COL = CONTROL_DB.weights  # {_id: "weights", values: {analyzerN: float}}
 
+T = TypeVar("T")
+
+# Dash callbacks are synchronous, so their HTTP calls are handed to one event loop
+# running on a daemon thread. All Graylog searches for a refresh then run
+# concurrently on that loop instead of each holding a thread of its own.
+IO_LOOP = asyncio.new_event_loop()
+threading.Thread(target=IO_LOOP.run_forever, name="webapp-io", daemon=True).start()
+
+# One keep-alive client for every Graylog and distributor call, so UI refreshes
+# reuse pooled connections instead of opening a new TCP connection per request.
+# Graylog credentials stay per-request so they are never sent to the distributor.
+HTTP_CLIENT = httpx.AsyncClient(
+    headers={"X-Requested-By": "webapp", "Accept": "application/json"},
+    # limits must sit on the transport: AsyncClient ignores its own limits=
+    # whenever an explicit transport is passed
+    transport=httpx.AsyncHTTPTransport(
+        retries=2,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    ),
+)
+
+
+def run_io(coro: Awaitable[T]) -> T:
+    """Run a coroutine on IO_LOOP and block the calling thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, IO_LOOP).result()
+
 
 def ensure_defaults() -> None:
-    """Insert default analyzer ON states and default weights if the collections are empty."""
+    """Seed default analyzer ON states and weights for any that are missing."""
+    # $setOnInsert upserts are idempotent, so every worker can run this at import
+    # without counting documents first. Upserts keyed on a non-unique field can
+    # both insert when they race, so analyzer names get a unique index; the
+    # weights document is keyed on _id, which already is one.
     try:
-        if ANALYZERS_COL.count_documents({}) == 0:
-            LOG.info("[INIT] inserting default analyzer states (all ON)")
-            ANALYZERS_COL.insert_many(
-                [{"name": name, "active": True} for name in ANALYZERS]
-            )
-
-        if WEIGHTS_COL.count_documents({"_id": "weights"}) == 0:
-            LOG.info("[INIT] inserting default weights 0.4/0.3/0.2/0.1")
-            WEIGHTS_COL.insert_one(
-                {
-                    "_id": "weights",
-                    "values": {
-                        "analyzer1": 0.4,
-                        "analyzer2": 0.3,
-                        "analyzer3": 0.2,
-                        "analyzer4": 0.1,
-                    },
-                }
-            )
+        WEIGHTS_COL.update_one(
+            {"_id": "weights"},
+            {"$setOnInsert": {"values": DEFAULT_WEIGHTS}},
+            upsert=True,
+        )
+        ANALYZERS_COL.create_index("name", unique=True)
+        ANALYZERS_COL.bulk_write(
+            [
+                UpdateOne(
+                    {"name": analyzer_name},
+                    {"$setOnInsert": {"active": True}},
+                    upsert=True,
+                )
+                for analyzer_name in ANALYZERS
+            ],
+            ordered=False,
+        )
     except PyMongoError as error:
         LOG.info("[MONGO] ensure_defaults failed: %s", error)
 
@@ -74,6 +138,37 @@ def ensure_defaults() -> None:
 ensure_defaults()
 
 
+def ttl_cache(ttl_secs: float) -> Callable:
+    """
+    Memoize a function by its positional args for ttl_secs.
+
+    Each key has its own lock, so concurrent callers for the same key wait for
+    one in-flight call and reuse its result, while different keys (e.g. the
+    parallel per-analyzer Graylog counts) still run side by side.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        entries: Dict[tuple, Tuple[float, object]] = {}
+        key_locks: Dict[tuple, threading.Lock] = {}
+        guard = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            with guard:
+                key_lock = key_locks.setdefault(args, threading.Lock())
+            with key_lock:
+                entry = entries.get(args)
+                if entry is not None and time.monotonic() - entry[0] < ttl_secs:
+                    return entry[1]
+                value = fn(*args)
+                entries[args] = (time.monotonic(), value)
+                return value
+
+        return wrapper
+
+    return decorator
+
+
 def get_states_and_weights() -> Tuple[Dict[str, bool], Dict[str, float]]:
     """Return (states, weights) from Mongo; fall back to safe defaults on error."""
     try:
@@ -98,18 +193,18 @@ def get_states_and_weights() -> Tuple[Dict[str, bool], Dict[str, float]]:
         return ({name: True for name in ANALYZERS}, {name: 0.25 for name in ANALYZERS})
 
 
-def graylog_count(analyzer_prefix: str) -> int:
+async def graylog_count(analyzer_prefix: str) -> int:
     """Count messages in last WINDOW_SECS where message contains '<analyzer_prefix>:'."""
     try:
-        response = requests.get(
+        response = await HTTP_CLIENT.get(
             f"{GRAYLOG_API}/search/universal/relative",
             params={"query": f'message:"{analyzer_prefix}:"', "range": WINDOW_SECS},
             auth=(GRAYLOG_USER, GRAYLOG_PASS),
-            headers={"X-Requested-By": "webapp", "Accept": "application/json"},
             timeout=5,
         )
-        if response.ok:
-            data = response.json()  # ValueError if not JSON
+        if response.is_success:
+            # parse the raw bytes; orjson.JSONDecodeError is a ValueError
+            data = orjson.loads(response.content)
             return int((data or {}).get("total_results", 0))
         LOG.info(
             "[GRAYLOG] %s returned %s: %s",
@@ -118,7 +213,7 @@ def graylog_count(analyzer_prefix: str) -> int:
             response.text[:200],
         )
         return 0
-    except RequestException as error:
+    except httpx.HTTPError as error:
         LOG.info("[GRAYLOG] request error for %s: %s", analyzer_prefix, error)
         return 0
     except ValueError as error:
@@ -126,15 +221,17 @@ def graylog_count(analyzer_prefix: str) -> int:
         return 0
 
 
-def fetch_breakers() -> Dict[str, Dict[str, int | float | str]]:
+async def fetch_breakers() -> Dict[str, Dict[str, int | float | str]]:
     """
     Fetch /health and normalize breaker info to:
     {name: {"state": str, "failures": int, "reopen_in": int}}
     """
     try:
-        response = requests.get(f"{DISTRIBUTOR_API}/health", timeout=3)
-        response.raise_for_status()
-        raw_breaker_map = (response.json() or {}).get("breakers") or {}
+        response = await HTTP_CLIENT.get(f"{DISTRIBUTOR_API}/health", timeout=3)
+        if response.status_code != 200:
+            LOG.info("[HEALTH] %s returned %s", response.url, response.status_code)
+            return {}
+        raw_breaker_map = (orjson.loads(response.content) or {}).get("breakers") or {}
         LOG.info("[HEALTH] breakers raw: %s", raw_breaker_map)
 
         normalized_breakers_data: Dict[str, Dict[str, int | float | str]] = {}
@@ -171,7 +268,7 @@ def fetch_breakers() -> Dict[str, Dict[str, int | float | str]]:
                 "reopen_in": seconds_until_reopen,
             }
         return normalized_breakers_data
-    except RequestException as error:
+    except httpx.HTTPError as error:
         LOG.info("[HEALTH] request error: %s", error)
         return {}
     except ValueError as error:
@@ -179,75 +276,90 @@ def fetch_breakers() -> Dict[str, Dict[str, int | float | str]]:
         return {}
 
 
-def render_breaker_table(
-    breakers_by_analyzer: Dict[str, Dict[str, int | float | str]]
-) -> html.Table:
-    """Render a small HTML table that displays circuit breaker status for each analyzer."""
-    header_cell_style = {"textAlign": "center", "padding": "6px"}
-    cell_style = {"textAlign": "center", "padding": "6px"}
+async def _poll_all() -> Tuple[List[int], Dict[str, Dict[str, int | float | str]]]:
+    *counts, breakers = await asyncio.gather(
+        *map(graylog_count, ANALYZERS), fetch_breakers()
+    )
+    return counts, breakers
+
+
+@ttl_cache(POLL_CACHE_SECS)
+def poll_all() -> Tuple[List[int], Dict[str, Dict[str, int | float | str]]]:
+    """
+    Everything the refresh callbacks show: Graylog counts in ANALYZERS order and
+    the normalized breakers, all requested at once. Both callbacks fire on the
+    same tick, so the second one reuses the first one's result.
+    """
+    return run_io(_poll_all())
+
 
+def breaker_cell_id(analyzer_name: str, field: str) -> Dict[str, str]:
+    """Pattern-matching id of one mutable breaker table cell."""
+    return {"type": "breaker", "field": field, "name": analyzer_name}
+
+
+def breaker_cell_text(
+    breakers_by_analyzer: Dict[str, Dict[str, int | float | str]],
+    analyzer_name: str,
+    field: str,
+) -> str:
+    """Display text of one breaker cell; unknown analyzers read as unknown/0/0."""
+    breaker_info = breakers_by_analyzer.get(analyzer_name, {})
+    if field == "state":
+        return str(breaker_info.get("state", "unknown"))
+    return str(int(breaker_info.get(field, 0)))
+
+
+def render_breaker_table() -> html.Table:
+    """
+    Render the circuit breaker table skeleton: static header and analyzer names,
+    plus BREAKER_FIELDS cells per analyzer that callbacks fill in by breaker_cell_id.
+    """
     header_row = html.Tr(
         [
-            html.Th("Analyzer", style=header_cell_style),
-            html.Th("State", style=header_cell_style),
-            html.Th("Failures", style=header_cell_style),
-            html.Th("Reopen In (s)", style=header_cell_style),
+            html.Th(title, style=BREAKER_HEADER_STYLE)
+            for title in ("Analyzer", "State", "Failures", "Reopen In (s)")
         ]
     )
 
-    data_rows = []
-    for analyzer_name in ANALYZERS:
-        breaker_info = breakers_by_analyzer.get(
-            analyzer_name, {"state": "unknown", "failures": 0, "reopen_in": 0}
-        )
-        data_rows.append(
-            html.Tr(
-                [
-                    html.Td(analyzer_name, style=cell_style),
-                    html.Td(
-                        str(breaker_info.get("state", "unknown")), style=cell_style
-                    ),
-                    html.Td(
-                        str(int(breaker_info.get("failures", 0))), style=cell_style
-                    ),
-                    html.Td(
-                        str(int(breaker_info.get("reopen_in", 0))), style=cell_style
-                    ),
-                ]
-            )
+    data_rows = [
+        html.Tr(
+            [html.Td(analyzer_name, style=BREAKER_CELL_STYLE)]
+            + [
+                html.Td(
+                    breaker_cell_text({}, analyzer_name, field),
+                    id=breaker_cell_id(analyzer_name, field),
+                    style=BREAKER_CELL_STYLE,
+                )
+                for field in BREAKER_FIELDS
+            ]
         )
+        for analyzer_name in ANALYZERS
+    ]
 
-    return html.Table(
-        [header_row] + data_rows,
-        style={"width": "100%", "borderCollapse": "collapse", "fontSize": "14px"},
-    )
+    return html.Table([header_row] + data_rows, style=BREAKER_TABLE_STYLE)
 
 
 def analyzer_state_control(analyzer_name: str, is_active: bool) -> html.Div:
     """Render a labeled ON/OFF radio control for a single analyzer."""
     return html.Div(
-        style={
-            "display": "flex",
-            "alignItems": "center",
-            "justifyContent": "space-between",
-            "margin": "6px 0",
-        },
+        style=CONTROL_ROW_STYLE,
         children=[
-            html.Div(analyzer_name, style={"fontWeight": "600"}),
+            html.Div(analyzer_name, style=CONTROL_NAME_STYLE),
             # Dash RadioItems values are lowercase strings "on"/"off" for consistency in callbacks
             html.Div(
                 [
                     html.Label(
                         "ON",
                         htmlFor=f"state-{analyzer_name}",
-                        style={"marginRight": "6px"},
+                        style=TOGGLE_LABEL_STYLE,
                     ),
                 ]
             ),
             # The inline RadioItems itself
             html.Div(
                 children=[],
-                style={"display": "none"},  # label is shown above; actual control below
+                style=HIDDEN_STYLE,  # label is shown above; actual control below
             ),
         ],
     )